@@ -1,8 +1,7 @@
 # Run in an Python environment with the following required libraries
 
 from __future__ import print_function
-from matplotlib import pyplot as plt
-import csv
+import collections
 import math
 import numpy as np
 import random
@@ -10,6 +9,16 @@ import sys
 import scipy.optimize
 import warnings
 
+try:
+	import numba
+except ImportError:
+	numba = None
+
+try:
+	import joblib
+except ImportError:
+	joblib = None
+
 
 # Parameters to be tuned with the gradient decent method
 TUNED_PARAMS = ["k1", "n0", "n1", "n2"]
@@ -25,74 +34,160 @@ INPUT_FILE = "NoProb_parameters.csv"
 OUTPUT_FILE = "fitted_NoProb_parameters.csv"
 # This is the raw data file. It should have 2 columns where every row is a time, frequency datapoint.
 DATA_FILE = "data.csv"
+# The plot of the fit is saved to this file. Pass --headless to skip the interactive window.
+GRAPH_FILE = "fit.png"
 MAX_ITER = 5000
+# Every dt guess is first screened with a short fit of at most SCREEN_ITER evaluations,
+# then only the REFINE_COUNT best guesses are fitted with up to MAX_ITER.
+# Much tighter budgets can misrank the guesses when the starting parameters are far
+# from the fit, so SCREEN_ITER leaves room for the solver to converge from poor starts.
+SCREEN_ITER = 20
+REFINE_COUNT = 10
+# The screening fits run in this dtype; float32 halves the memory traffic of the kernels.
+# The refinement always runs in float64, so the reported fit keeps full precision.
+SCREEN_DTYPE = np.float32
+# Convergence tolerances on the relative change in loss and on the gradient
+FTOL = 1e-12
+GTOL = 1e-9
+# Lower bounds on the tuned parameters, in the same order as TUNED_PARAMS
+PARAMETER_LOWER_BOUNDS = [1e-12, 1e-12, -np.inf, -np.inf]
 
 """
 These are the methods specific to the function being optimized
 """
 
 ################################################################################################
+
+# The fixed (not tuned) model parameters of one fit, see make_aux
+Aux = collections.namedtuple("Aux", "dt c3 cvert r")
+
+def make_aux(aux_parameters):
+	"""Pack the fixed model parameters of the aux_parameters dict into an Aux."""
+
+	return Aux(aux_parameters["dt"], aux_parameters["c3"], aux_parameters["cvert"], aux_parameters["r"])
 	
-def get_saturation_gradient (t, parameters, aux_parameters):
-	"""Saturation gradient is a vector in the following order:
+def get_fixed_dt_terms(X, aux):
+	"""Return the parts of the model that do not depend on the tuned parameters:
+		* adj = X - dt
+		* sfac = s_curve = 1 / (1 + C3 * exp(-r * adj))
+
+	These only change with dt, so one fit computes them once and reuses them
+	for every solver iteration. Both keep the dtype of X.
+	"""
+
+	adj = np.subtract(X, aux.dt, dtype=X.dtype)
+	# far left of dt exp(-r * adj) overflows to inf, giving the intended limit sfac = 0
+	with np.errstate(over="ignore"):
+		sfac = np.multiply(adj, -aux.r, dtype=X.dtype)
+		np.exp(sfac, out=sfac)
+		sfac *= aux.c3
+	sfac += 1.0
+	np.reciprocal(sfac, out=sfac)
+
+	return adj, sfac
+
+def _sat(adj, sfac, K1, N0, N1, N2, Cvert):
+	"""Fused evaluation of mod_maxwell * s_curve + steady over adj = X - dt.
+
+	All intermediates are written into two preallocated buffers, so each
+	call allocates two arrays instead of a dozen temporaries.
+	"""
+
+	out = np.empty_like(adj)
+	buf = np.empty_like(adj)
+
+	# mod_maxwell: (1 - exp(-adj / T)) / K1 + adj / N1, with T = N0 / K1
+	# expm1 keeps 1 - exp(x) accurate for adj close to 0
+	np.multiply(adj, -K1 / N0, out=out)
+	np.expm1(out, out=out)
+	out /= -K1
+	np.divide(adj, N1, out=buf)
+	out += buf
+
+	# times s_curve
+	out *= sfac
+	np.negative(out, out=out)
+
+	# steady: adj / N2 + Cvert
+	np.divide(adj, N2, out=buf)
+	out += buf
+	out += Cvert
+
+	return out
+
+def _sat_gradient(adj, sfac, K1, N0, N1, N2):
+	"""Return the (4, N) matrix of partial derivatives of _sat over adj, in the following order:
 		* df_dK1
 		* df_dN0
 		* df_dN1
 		* df_dN2
 		
+	The derivative formulas only live in _sat_with_gradient (one copy per
+	backend); this takes its gradient half. Cvert does not affect it.
 	"""
-	K1 = parameters[0]
-	N0 = parameters[1]
-	N1 = parameters[2]
-	N2 = parameters[3]
-	dt = aux_parameters["dt"]
-	T = N0 / K1
-	C3 = aux_parameters["c3"]
-	Cvert = aux_parameters["cvert"]
-	r = aux_parameters["r"]
-
-	df_dk1 = (-1/(C3*np.exp(r*(dt-t))))*((((dt-t)*np.exp((-K1*(dt-t))/(N1)))/(K1*N1)) - (1-np.exp((-K1*(dt-t))/(N1)))/K1**2)
-	df_dN0 = -(dt-t)*np.exp((K1*(dt-t))/(N0))/((N0**2)*(C3*np.exp(r*(dt-t))+1))
-	df_dN1 = (t-dt)/((N1**2)*(C3*np.exp(r*(dt-t))+1))
-	df_dN2 = (dt-t)/(N2**2)
-
-	return np.array([df_dk1, df_dN0, df_dN1, df_dN2])
-	
-def mod_maxwell(time, parameters, aux_parameters):
-
-	K1 = parameters[0]
-	N0 = parameters[1]
-	N1 = parameters[2]
-	N2 = parameters[3]
-	dt = aux_parameters["dt"]
-	T = N0 / K1  # very large, when K1 very small; and this is a positive #
-	C3 = aux_parameters["c3"]
-	Cvert = aux_parameters["cvert"]
-	r = aux_parameters["r"]
-	adjusted_t = time - dt
-
 
-	return -1 * ((1/K1) * (1 - np.exp(-1 * (adjusted_t) / T)) + (adjusted_t)/N1)
-	
-def s_curve (time, parameters, aux_parameters):
-
-	dt = aux_parameters["dt"]
-	C3 = aux_parameters["c3"]
-	Cvert = aux_parameters["cvert"]
-	r = aux_parameters["r"]
-	
-	return 1/(1+C3*np.exp((-time + dt)*r))
-	
-def steady(time, parameters, aux_parameters):
-	N2 = parameters[3]
-	dt = aux_parameters["dt"]
-	C3 = aux_parameters["c3"]
-	Cvert = aux_parameters["cvert"]
-	r = aux_parameters["r"]
-	
-	return (time-dt)/N2 + Cvert
-	
-def saturation_function(time, parameters, aux_parameters):
+	return _sat_with_gradient(adj, sfac, K1, N0, N1, N2, adj.dtype.type(0))[1]
+
+def _sat_with_gradient(adj, sfac, K1, N0, N1, N2, Cvert):
+	"""Return _sat and _sat_gradient together, sharing exp(-adj / T) between them."""
+
+	em1 = np.expm1(-K1 * adj / N0)
+	e1 = em1 + 1
+
+	sat = -(-em1 / K1 + adj / N1) * sfac + adj / N2 + Cvert
+
+	grad = np.empty((4, len(adj)), dtype=adj.dtype)
+	grad[0] = -sfac * (adj * e1 / (K1 * N0) + em1 / K1**2)
+	grad[1] = sfac * adj * e1 / N0**2
+	grad[2] = sfac * adj / N1**2
+	grad[3] = -adj / N2**2
+
+	return sat, grad
+
+if numba is not None:
+	# Same kernels as above, compiled to a single parallel loop over adj.
+	# _sat_gradient above picks up the compiled _sat_with_gradient.
+	# nnan/ninf are left out of the fastmath flags because exp() can
+	# legitimately overflow for poor parameter guesses.
+	_FASTMATH = set(["nsz", "arcp", "contract", "afn", "reassoc"])
+	# Signatures are fixed up front so the kernels are compiled (or loaded
+	# from the cache) once at import instead of on the first solver call.
+	# Calls are still matched against these signatures; nothing new is
+	# compiled lazily.
+	# Only the variants that run are listed: saturation_function always
+	# evaluates _sat in float64, and the fits call _sat_with_gradient in the
+	# screening (float32) and refinement (float64) dtypes.
+	_SAT_SIGNATURE = ["float64[::1](float64[::1], float64[::1], float64, float64, float64, float64, float64)"]
+	_SAT_WITH_GRADIENT_SIGNATURE = ["Tuple((%s[::1], %s[:, ::1]))(%s[::1], %s[::1], %s, %s, %s, %s, %s)" % ((t,) * 9) for t in ("float64", "float32")]
+
+	@numba.njit(_SAT_SIGNATURE, parallel=True, fastmath=_FASTMATH, cache=True)
+	def _sat(adj, sfac, K1, N0, N1, N2, Cvert):
+		out = np.empty_like(adj)
+		for i in numba.prange(adj.shape[0]):
+			a = adj[i]
+			maxwell = -np.expm1(-a * K1 / N0) / K1 + a / N1
+			out[i] = -maxwell * sfac[i] + a / N2 + Cvert
+		return out
+
+	@numba.njit(_SAT_WITH_GRADIENT_SIGNATURE, parallel=True, fastmath=_FASTMATH, cache=True)
+	def _sat_with_gradient(adj, sfac, K1, N0, N1, N2, Cvert):
+		out = np.empty_like(adj)
+		grad = np.empty((4, adj.shape[0]), adj.dtype)
+		# an int literal would promote float32 arithmetic to float64
+		one = np.ones(1, adj.dtype)[0]
+		for i in numba.prange(adj.shape[0]):
+			a = adj[i]
+			s = sfac[i]
+			em1 = np.expm1(-K1 * a / N0)
+			e1 = em1 + one
+			out[i] = -(-em1 / K1 + a / N1) * s + a / N2 + Cvert
+			grad[0, i] = -s * (a * e1 / (K1 * N0) + em1 / (K1 * K1))
+			grad[1, i] = s * a * e1 / (N0 * N0)
+			grad[2, i] = s * a / (N1 * N1)
+			grad[3, i] = -a / (N2 * N2)
+		return out, grad
+
+def saturation_function(time, parameters, aux):
 	"""Parameters is a vector in the following order:
 		* K1
 		* N0
@@ -103,56 +198,60 @@ def saturation_function(time, parameters, aux_parameters):
 		* Cvert
 		* r
 		
+	where dt, C3, Cvert and r come from the Aux tuple aux.
 	"""
-	
-	return mod_maxwell(time, parameters, aux_parameters) * s_curve(time, parameters, aux_parameters) + steady(time, parameters, aux_parameters)
+
+	time = np.asarray(time, dtype=np.float64)
+	adj, sfac = get_fixed_dt_terms(np.ascontiguousarray(time.ravel()), aux)
+	K1, N0, N1, N2 = parameters
+	sat = _sat(adj, sfac, K1, N0, N1, N2, aux.cvert)
+
+	return sat.reshape(time.shape)
 
 ##################################################################
 
-def get_obj_function(X, Y, aux_parameters):
-	"""Return the function which must be minimized."""
+def get_residual_functions(Y, adj, sfac, aux):
+	"""Return the residual function whose sum of squares must be minimized and its Jacobian.
+	adj, sfac are the precomputed get_fixed_dt_terms of the data.
+	The kernels run in the dtype of the data, but scipy always sees float64.
+
+	least_squares asks for the Jacobian at the point it has just evaluated,
+	so the residual evaluates both in one pass and the Jacobian reuses it.
+	"""
 
-	return lambda parameters: np.sum((Y - saturation_function(X, list(parameters), aux_parameters))** 2)
+	dtype = adj.dtype
+	cvert = dtype.type(aux.cvert)
+	last = {}
 
-def get_gradient_function(X, Y, aux_parameters):
-	"""Return the function which evaluates gradient."""
+	def residual_fn(parameters):
+		K1, N0, N1, N2 = parameters.astype(dtype)
+		sat, grad = _sat_with_gradient(adj, sfac, K1, N0, N1, N2, cvert)
+		last["parameters"] = parameters.copy()
+		last["grad"] = grad
+		return (Y - sat).astype(np.float64, copy=False)
 
-	return lambda parameters: get_gradient(X, Y, parameters, aux_parameters)
+	def jacobian_fn(parameters):
+		if np.array_equal(parameters, last.get("parameters")):
+			grad = last["grad"]
+		else:
+			K1, N0, N1, N2 = parameters.astype(dtype)
+			grad = _sat_gradient(adj, sfac, K1, N0, N1, N2)
+		return -grad.astype(np.float64, copy=False).T
 
+	return residual_fn, jacobian_fn
 
 """
 Function-agnostic methods.
 This is the meat of the program
 """
 
-def get_gradient(X, Y, parameters, aux_parameters):
-	"""Return gradient over all parameters.
-	Will return 0 for all parameters other than first 5, because not optimizing those."""
-
-	obj_grad = np.zeros(len(parameters), dtype=np.float64)
-
-	# compute gradients for all data points
-	grad = get_saturation_gradient(X, parameters, aux_parameters)
-
-	for i in range(len(obj_grad)):
-		obj_grad[i] = np.sum(-2 * Y * grad[i] + 2 * saturation_function(X, parameters, aux_parameters) * grad[i])
-
-	return obj_grad
-
-def get_loss(X, Y, parameters, aux_parameters):
-	"""Return float that gives loss of function being optimized compared to ideal scenario.
-	"""
-
-	return np.sum((Y - saturation_function(X, parameters, aux_parameters)) ** 2)
-
-	
 def read_parameters_from_file():
 	"""Read user-defined parameters from a file."""
 
 	parameters = np.zeros(len(TUNED_PARAMS)) * 1.0
 	d = {}
 
-	with open(INPUT_FILE, "rb") as fp:
+	with open(INPUT_FILE, "r", buffering=1 << 20) as fp:
 		for line in fp:
 			if line.startswith("#") or len(line.strip()) == 0:
 				continue
@@ -185,7 +284,7 @@ def read_parameters_from_file():
 	user_in = "x"
 	
 	while user_in not in ["y", "n"]:
-		user_in = raw_input("This is OK? [y/n] ")
+		user_in = input("This is OK? [y/n] ")
 		
 	if user_in == "y":
 		return parameters, d
@@ -195,82 +294,113 @@ def read_parameters_from_file():
 def set_parameters():
 	return read_parameters_from_file()
 	
-def scipy_optimize(X, Y, aux_parameters, parameters):
-
-            
-       	obj_fn = get_obj_function(X, Y, aux_parameters)
-       	grad_obj_fn = get_gradient_function(X, Y, aux_parameters)
-       	new_params = scipy.optimize.fmin_bfgs(obj_fn, parameters, fprime=grad_obj_fn, maxiter=MAX_ITER)
-        
-        
-       	new_fn = lambda p: (Y - saturation_function (X, p, aux_parameters))
-       	optimized_params = scipy.optimize.leastsq (new_fn, new_params)[0]
-       	loss = get_loss(X, Y, optimized_params, aux_parameters)
-       	
-   	return optimized_params, loss
+def scipy_optimize(X, Y, aux, parameters, max_nfev=MAX_ITER):
+	"""Fit the tuned parameters with a trust-region least-squares solver."""
+
+	# dt is fixed for the whole fit, so build its terms once
+	adj, sfac = get_fixed_dt_terms(X, aux)
+	residual_fn, jacobian_fn = get_residual_functions(Y, adj, sfac, aux)
+	# K1 and N0 divide the model and T = N0 / K1 must stay positive
+	bounds = (PARAMETER_LOWER_BOUNDS, np.inf)
+	# tolerances below the precision of the data can never be met
+	eps = np.finfo(X.dtype).eps
+	result = scipy.optimize.least_squares(residual_fn, parameters, jac=jacobian_fn, bounds=bounds, method="trf",
+		ftol=max(FTOL, eps), gtol=max(GTOL, eps), max_nfev=max_nfev)
+	loss = np.dot(result.fun, result.fun)
+
+	return result.x, loss
 	
+def fit_one_dt(X, Y, aux_parameters, parameters, dt, cvert, max_nfev=MAX_ITER):
+	"""Fit the tuned parameters for a single dt guess and its cvert."""
+
+	aux = make_aux(dict(aux_parameters, dt=dt, cvert=cvert))
+
+	return scipy_optimize(X, Y, aux, parameters, max_nfev)
+
+def fit_dt_guesses(X, Y, aux_parameters, guess_parameters, guess_dt, guess_cvert, max_nfev=MAX_ITER):
+	"""Return a (params, loss) tuple for every dt guess, each fit starting from its guess_parameters.
+	The fits are independent, so they run on all cores when joblib is available."""
+
+	guesses = list(zip(guess_parameters, guess_dt, guess_cvert))
+
+	if joblib is None:
+		return [fit_one_dt(X, Y, aux_parameters, parameters, dt, cvert, max_nfev) for parameters, dt, cvert in guesses]
+
+	# one BLAS / numba thread per worker to avoid oversubscribing the cores
+	with joblib.parallel_backend("loky", inner_max_num_threads=1):
+		return joblib.Parallel(n_jobs=-1)(
+			joblib.delayed(fit_one_dt)(X, Y, aux_parameters, parameters, dt, cvert, max_nfev)
+			for parameters, dt, cvert in guesses)
+
 def load_data():
 	"""Return time, f5 as np.array tuple."""
 
-	time = []
-	f5 = []
-	header = True
+	data = np.loadtxt(DATA_FILE, delimiter=",", skiprows=1, usecols=(0, 1), dtype=np.float64, ndmin=2)
 
-	with open(DATA_FILE, "rb") as fp:
-		reader = csv.reader(fp, delimiter=",")
-		for row in reader:
-			if header:
-				header = False
-			else:
-				t = np.float64(row[0])
-				time.append(t)
-				f5.append(np.float64(row[1]))
+	return (data[:, 0].copy(), data[:, 1].copy())
 
-	return (np.array(time), np.array(f5))
+def show_data(X, Y, parameter_guess, optimized_params, aux, headless=False):
+	"""Show pretty plot of F5 vs. Time to make sure data imported correctly.
+	The plot is always saved to GRAPH_FILE; headless skips the blocking window."""
 
-def show_data(X, Y, parameter_guess, optimized_params, aux_parameters):
-	"""Show pretty plot of F5 vs. Time to make sure data imported correctly."""
+	# matplotlib is slow to import and only needed here
+	from matplotlib import pyplot as plt
+
+	if headless:
+		plt.switch_backend("Agg")
 	
-	guess_fitted = saturation_function(X, parameter_guess, aux_params)
-	optimized_fitted = saturation_function(X, optimized_params, aux_params)
+	guess_fitted = saturation_function(X, parameter_guess, aux)
+	optimized_fitted = saturation_function(X, optimized_params, aux)
 
 	plt.plot(X, Y, 'bo', X, guess_fitted, 'r+', X, optimized_fitted, 'r-')
-	plt.show()
+	plt.savefig(GRAPH_FILE, dpi=100)
+	if not headless:
+		plt.show()
+	plt.close()
 
 	
 def trim_data (X, Y, left_cutoff, right_cutoff):
-	new_Y = Y[np.where(X >= left_cutoff)]
-	new_X = X[np.where(X >= left_cutoff)]
-	
-	new_Y = new_Y[np.where(new_X <= right_cutoff)]
-	new_X = new_X[np.where(new_X <= right_cutoff)]
-	return new_X, new_Y
-
-def getAsymtote_Y(parameters, aux_parameters):
-        dt = aux_parameters['dt']
-        ddB_dt = abs((saturation_function(dt, parameters, aux_parameters) - saturation_function((dt-1), parameters, aux_parameters)) - (saturation_function((dt+1), parameters, aux_parameters) - saturation_function(dt, parameters, aux_parameters)))
-        #use dt as the guess interval 
-        #i==0 would be left of the function which starts at optimization_left_cutoff (parameters[8]) so skipped
-        for i in range(1, 100): 
-            dB_asym_guess_1 = saturation_function((dt*i), parameters, aux_parameters) - saturation_function((dt*i-1), parameters, aux_parameters)
-            dB_asym_guess_2 = saturation_function((dt*i+1), parameters, aux_parameters) - saturation_function(dt*i, parameters, aux_parameters)
-            ddB_asym_guess = dB_asym_guess_1 - dB_asym_guess_2
-            print(ddB_dt*0.01, ddB_asym_guess, i)
-            if ddB_dt*0.01 > abs(ddB_asym_guess): 
-                print(ddB_dt*0.01, ddB_asym_guess, i)
-                if (dB_asym_guess_2 < 0):
-                    print("regular RT", ddB_asym_guess)
-                    return saturation_function (dt*i, parameters, aux_parameters)
-                else:
-                    print("inverse RT")
-                    #return the inverse
-                    return saturation_function (dt*i, parameters, aux_parameters) - dt*i*dB_asym_guess_2
-            else:
-                continue
-        print("Could not find asymtote for Rt")
-        sys.exit(1)
+	"""Return the X, Y points with left_cutoff <= X <= right_cutoff."""
+
+	if np.all(X[1:] >= X[:-1]):
+		# time series are sorted, so the window is a contiguous slice
+		i0 = np.searchsorted(X, left_cutoff, side="left")
+		i1 = np.searchsorted(X, right_cutoff, side="right")
+		return X[i0:i1], Y[i0:i1]
+
+	mask = (X >= left_cutoff) & (X <= right_cutoff)
+	return X[mask], Y[mask]
+
+def getAsymtote_Y(parameters, aux):
+	dt = aux.dt
+	#use dt as the guess interval 
+	#i==0 would be left of the function which starts at optimization_left_cutoff (parameters[8]) so skipped
+	#column i-1 holds dt*i, so column 0 is dt itself; rows are the point -1, the point and the point +1
+	guess_t = dt * np.arange(1, 100)
+	vals = saturation_function(guess_t + np.array([[-1.0], [0.0], [1.0]]), parameters, aux)
+	dB_asym_guess_1 = vals[1] - vals[0]
+	dB_asym_guess_2 = vals[2] - vals[1]
+	ddB_asym_guess = dB_asym_guess_1 - dB_asym_guess_2
+	ddB_dt = abs(ddB_asym_guess[0])
+
+	converged = ddB_dt*0.01 > np.abs(ddB_asym_guess)
+	if not converged.any():
+		print("Could not find asymtote for Rt")
+		sys.exit(1)
+
+	j = np.argmax(converged)
+	i = j + 1
+	print(ddB_dt*0.01, ddB_asym_guess[j], i)
+	if (dB_asym_guess_2[j] < 0):
+		print("regular RT", ddB_asym_guess[j])
+		return vals[1, j]
+	else:
+		print("inverse RT")
+		#return the inverse
+		return vals[1, j] - dt*i*dB_asym_guess_2[j]
 
 if __name__ == "__main__":
+	headless = "--headless" in sys.argv[1:]
 	# load data from file
 	raw_X, raw_Y = load_data()
 	# load user-defined parameters from file
@@ -282,57 +412,54 @@ if __name__ == "__main__":
 	display_X, display_Y = trim_data(raw_X, raw_Y, aux_params["graph_left_cutoff"], aux_params["graph_right_cutoff"])
 	span_dt, span_cvert = trim_data(raw_X, raw_Y, aux_params["dt_min"], aux_params["dt_max"])
 	
-	guess_dt = []
-	guess_cvert = []
 	#shorten span_dt, span_cvert even further so that you only do a certain number of itterations
 	max_itterations = 200
 	span_length = len(span_dt)
-	if span_length > max_itterations:
-	    max_index = span_length-1
-	    index_interval = int(max_index/max_itterations)
-	    #print(max_index, span_dt[max_index])
-	    for i in range(0, max_itterations):
-	        span_index = i*index_interval
-	        #print(span_index, span_dt[91])
-                guess_dt.append(span_dt[span_index])
-                guess_cvert.append(span_cvert[span_index])
-            
+	span_index = np.linspace(0, span_length - 1, min(span_length, max_itterations), dtype=np.int64)
+	guess_dt = span_dt[span_index]
+	guess_cvert = span_cvert[span_index]
 	
 	loss = 0
 	best_guess_index = 0
-	loss_array = []
-	loss_array.append(['dt', 'loss'])
+	# columns are dt, loss and whether that loss comes from a refined fit (1) or only the screening fit (0)
+	loss_array = np.zeros((len(guess_dt), 3))
 	
 	
 	print("itterating through guess array of length %s" % (len(guess_dt)))
-	for index in range(0, len(guess_dt)):
-	   aux_params['dt'] = guess_dt[index]
-	   aux_params['cvert'] = guess_cvert[index]
-	   guess_params, guess_loss = scipy_optimize(optimization_X, optimization_Y, aux_params, parameter_guess)
-           loss_array.append([guess_dt[index], guess_loss])
-
-	   if loss == 0 or guess_loss < loss:
-	       new_params = guess_params
-	       loss = guess_loss 
-	       best_guess_index = index
-	       print("best guess is now %.2f at dt of %s" % (loss, guess_dt[index]))
-	   else:
-	       continue
-
-        string_name = 'dtVsLoss.csv'
+	# cheap screening pass over every guess, all starting from the user's parameters
+	screen_X = optimization_X.astype(SCREEN_DTYPE)
+	screen_Y = optimization_Y.astype(SCREEN_DTYPE)
+	results = fit_dt_guesses(screen_X, screen_Y, aux_params, [parameter_guess] * len(guess_dt), guess_dt, guess_cvert, SCREEN_ITER)
+
+	# fine-tune only the most promising guesses, warm-started from their screening fit
+	refine_index = np.argsort([guess_loss for guess_params, guess_loss in results])[:REFINE_COUNT]
+	refined = fit_dt_guesses(optimization_X, optimization_Y, aux_params, [results[i][0] for i in refine_index], guess_dt[refine_index], guess_cvert[refine_index])
+	for i, result in zip(refine_index, refined):
+		results[i] = result
+	loss_array[refine_index, 2] = 1
+
+	for index, (guess_params, guess_loss) in enumerate(results):
+		loss_array[index, :2] = (guess_dt[index], guess_loss)
+
+		if loss == 0 or guess_loss < loss:
+			new_params = guess_params
+			loss = guess_loss
+			best_guess_index = index
+			print("best guess is now %.2f at dt of %s" % (loss, guess_dt[index]))
+
+	string_name = 'dtVsLoss.csv'
 	#write loss vs dt graph
-        with open(string_name, 'w+') as fp: 
-            a = csv.writer(fp)
-            for y in range(len(loss_array[0])):
-                a.writerow([x[y] for x in loss_array]) 
-                          
+	np.savetxt(string_name, loss_array, fmt=['%s', '%s', '%d'], delimiter=',', header='dt,loss,refined', comments='')
+	
 	print("Final best guess was at dt = %s" % guess_dt[best_guess_index])
 
 	aux_params['dt'] = guess_dt[best_guess_index]
 	aux_params['cvert'] = guess_cvert[best_guess_index]
 	
-        asymptote_Y = getAsymtote_Y(new_params, aux_params)
-	aux_params['bt'] = asymptote_Y - saturation_function(aux_params['optimization_left_cutoff'], new_params, aux_params)
+	best_aux = make_aux(aux_params)
+	
+	asymptote_Y = getAsymtote_Y(new_params, best_aux)
+	aux_params['bt'] = asymptote_Y - saturation_function(aux_params['optimization_left_cutoff'], new_params, best_aux)
 	print("dt = %.2f cvert = %.2f bt = %.2f" % (aux_params['dt'], aux_params['cvert'], aux_params['bt']))
 
 	if new_params is not None:
@@ -348,4 +475,4 @@ if __name__ == "__main__":
 			fp.write("%s = %s\n" % ('bt', aux_params['bt']))
 
 	
-		show_data(display_X, display_Y, parameter_guess, new_params, aux_params)
\ No newline at end of file
+		show_data(display_X, display_Y, parameter_guess, new_params, best_aux, headless)
\ No newline at end of file